@@ -1,4 +1,11 @@
+import contextlib
+import io
+import os
+import re
+
 class Token:
+    __slots__ = ('type', 'value', 'line', 'column')
+
     def __init__(self, type, value=None, line=None, column=None):
         self.type = type  # Tipo do token
         self.value = value  # Valor do token
@@ -11,195 +18,251 @@ class Token:
     def __repr__(self):
         return self.__str__()
 
+# Expressão regular do analisador léxico. Cada casamento consome os espaços
+# anteriores (NL guarda o trecho até a última quebra de linha) e um único
+# caractere (CHAR), classificado depois por _TOKEN_TYPES
+_TOKEN_RE = re.compile(r'(?P<NL>[ \t\n]*\n)?[ \t]*(?P<CHAR>[^ \t\n])')
+
+# Tabela de classificação: caractere -> tipo do token. O tipo de um símbolo é o
+# próprio caractere
+_TOKEN_TYPES = {c: c for c in '=G+-*/%PIW{}#<'}
+_TOKEN_TYPES.update(dict.fromkeys('abcdefghijklmnopqrstuvwxyz', 'VARIABLE'))
+_TOKEN_TYPES.update(dict.fromkeys('0123456789', 'NUMBER'))
+
 class Lexer:
     def __init__(self, text):
         self.text = text.replace('\r', '')  # Remove carriage returns
-        self.pos = 0
-        self.line = 1
-        self.column = 1
-        self.current_char = self.text[self.pos] if self.text else None
-
-    def advance(self):
-        """Avança o ponteiro 'pos' e atualiza 'current_char'."""
-        if self.current_char == '\n':
-            self.line += 1
-            self.column = 0
-        self.pos += 1
-        self.column += 1
-        if self.pos >= len(self.text):
-            self.current_char = None  # Indica fim da entrada
-        else:
-            self.current_char = self.text[self.pos]
-
-    def skip_whitespace(self):
-        """Ignora espaços em branco."""
-        while self.current_char is not None and self.current_char in ' \t\n':
-            self.advance()
-
-    def get_next_token(self):
-        """Analisador léxico (tokenizador)"""
-        while self.current_char is not None:
-            if self.current_char in ' \t\n':
-                self.skip_whitespace()
-                continue
 
-            token_line = self.line
-            token_column = self.column
+    def __iter__(self):
+        """Analisador léxico (tokenizador): produz os tokens da entrada até EOF."""
+        text = self.text
+        token_types = _TOKEN_TYPES
+        line = 1
+        line_start = 0  # Posição do primeiro caractere da linha atual
+        # Espaços no fim da entrada não formam token; ficam fora da busca
+        end = len(text)
+        while end and text[end - 1] in ' \t\n':
+            end -= 1
+        for m in _TOKEN_RE.finditer(text, 0, end):
+            nl, char = m.group('NL', 'CHAR')
+            if nl:
+                line += nl.count('\n')
+                line_start = m.start() + len(nl)
+
+            token_type = token_types.get(char)
+            if token_type is None:
+                # Caractere não reconhecido
+                raise Exception(f'Caractere inválido "{char}" na linha {line}, coluna {m.end() - line_start}.')
+            yield Token(token_type, char, line, m.end() - line_start)
+
+        yield Token('EOF', line=text.count('\n') + 1, column=len(text) - text.rfind('\n'))
 
-            if self.current_char in '=G+-*/%PIW{}#<':
-                char = self.current_char
-                self.advance()
-                return Token(char, char, token_line, token_column)
+class ASTNode:
+    __slots__ = ()
 
-            if self.current_char.islower():
-                var = self.current_char
-                self.advance()
-                return Token('VARIABLE', var, token_line, token_column)
+class CommandNode(ASTNode):
+    """Comando: emitido pelo CodeGenerator.generate, sem recursão."""
+    __slots__ = ()
+    is_block = False  # Só blocos têm filhos e fechamento; folhas custam uma chamada
 
-            if self.current_char.isdigit():
-                num = self.current_char
-                self.advance()
-                return Token('NUMBER', num, token_line, token_column)
+    def emit_open(self, code_generator):
+        raise NotImplementedError
 
-            # Caractere não reconhecido
-            raise Exception(f'Caractere inválido "{self.current_char}" na linha {self.line}, coluna {self.column}.')
+    def emit_close(self, code_generator):
+        pass
 
-        return Token('EOF', line=self.line, column=self.column)
+    def children(self):
+        return ()
 
-class ASTNode:
-    def generate_code(self, code_generator):
-        raise NotImplementedError
+class ProgramNode(CommandNode):
+    __slots__ = ('commands',)
+    is_block = True
 
-class ProgramNode(ASTNode):
     def __init__(self, commands):
         self.commands = commands
 
-    def generate_code(self, code_generator):
-        for cmd in self.commands:
-            cmd.generate_code(code_generator)
+    def emit_open(self, code_generator):
+        pass
+
+    def children(self):
+        return self.commands
+
+class AssignCommandNode(CommandNode):
+    __slots__ = ('var', 'value')
 
-class AssignCommandNode(ASTNode):
     def __init__(self, var, value):
         self.var = var
         self.value = value
 
-    def generate_code(self, code_generator):
-        code_generator.add_variable(self.var)
+    def emit_open(self, code_generator):
         val_code = self.value.generate_code(code_generator)
         code_generator.emit(f'{code_generator.indent()}{self.var} = {val_code};')
 
-class GetCommandNode(ASTNode):
+class GetCommandNode(CommandNode):
+    __slots__ = ('var',)
+
     def __init__(self, var):
         self.var = var
 
-    def generate_code(self, code_generator):
-        code_generator.add_variable(self.var)
-        code_generator.emit(f'{code_generator.indent()}{{ gets(str);')
-        code_generator.emit(f'{code_generator.indent()}sscanf(str, "%d", &{self.var});')
-        code_generator.emit(f'{code_generator.indent()}}}')
+    def emit_open(self, code_generator):
+        ind = code_generator.indent()
+        code_generator.emit(f'{ind}{{ gets(str);\n{ind}sscanf(str, "%d", &{self.var});\n{ind}}}')
+
+class BinaryOperationNode(CommandNode):
+    __slots__ = ('operator', 'var', 'left', 'right')
 
-class BinaryOperationNode(ASTNode):
     def __init__(self, operator, var, left, right):
         self.operator = operator
         self.var = var
         self.left = left
         self.right = right
 
-    def generate_code(self, code_generator):
-        code_generator.add_variable(self.var)
+    def emit_open(self, code_generator):
         left_code = self.left.generate_code(code_generator)
         right_code = self.right.generate_code(code_generator)
         code_generator.emit(f'{code_generator.indent()}{self.var} = {left_code} {self.operator} {right_code};')
 
-class PrintCommandNode(ASTNode):
+class PrintCommandNode(CommandNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
-    def generate_code(self, code_generator):
+    def emit_open(self, code_generator):
         val_code = self.value.generate_code(code_generator)
         code_generator.emit(f'{code_generator.indent()}printf("%d\\n", {val_code});')
 
-class IfCommandNode(ASTNode):
+class IfCommandNode(CommandNode):
+    __slots__ = ('comparison', 'command')
+    is_block = True
+
     def __init__(self, comparison, command):
         self.comparison = comparison
         self.command = command
 
-    def generate_code(self, code_generator):
+    def emit_open(self, code_generator):
         comp_code = self.comparison.generate_code(code_generator)
         code_generator.emit(f'{code_generator.indent()}if ( {comp_code} ) {{')
         code_generator.indent_level += 1
-        self.command.generate_code(code_generator)
+
+    def emit_close(self, code_generator):
         code_generator.indent_level -= 1
         code_generator.emit(f'{code_generator.indent()}}}')
 
-class WhileCommandNode(ASTNode):
+    def children(self):
+        return (self.command,)
+
+class WhileCommandNode(CommandNode):
+    __slots__ = ('comparison', 'command')
+    is_block = True
+
     def __init__(self, comparison, command):
         self.comparison = comparison
         self.command = command
 
-    def generate_code(self, code_generator):
+    def emit_open(self, code_generator):
         comp_code = self.comparison.generate_code(code_generator)
         code_generator.emit(f'{code_generator.indent()}while ( {comp_code} ) {{')
         code_generator.indent_level += 1
-        self.command.generate_code(code_generator)
+
+    def emit_close(self, code_generator):
         code_generator.indent_level -= 1
         code_generator.emit(f'{code_generator.indent()}}}')
 
-class CompositeCommandNode(ASTNode):
+    def children(self):
+        return (self.command,)
+
+class CompositeCommandNode(CommandNode):
+    __slots__ = ('commands',)
+    is_block = True
+
     def __init__(self, commands):
         self.commands = commands
 
-    def generate_code(self, code_generator):
+    def emit_open(self, code_generator):
         code_generator.emit(f'{code_generator.indent()}{{')
         code_generator.indent_level += 1
-        for cmd in self.commands:
-            cmd.generate_code(code_generator)
+
+    def emit_close(self, code_generator):
         code_generator.indent_level -= 1
         code_generator.emit(f'{code_generator.indent()}}}')
 
+    def children(self):
+        return self.commands
+
 class ComparisonNode(ASTNode):
+    __slots__ = ('left', 'operator', 'right')
+
     def __init__(self, left, operator, right):
         self.left = left  # VariableNode
         self.operator = operator  # '==', '!=', '<'
-        self.right = right  # ValueNode
+        self.right = right  # VariableNode ou NumberNode
 
     def generate_code(self, code_generator):
         left_code = self.left.generate_code(code_generator)
         right_code = self.right.generate_code(code_generator)
         return f'{left_code} {self.operator} {right_code}'
 
-class ValueNode(ASTNode):
-    def __init__(self, value):
-        self.value = value  # VariableNode ou NumberNode
-
-    def generate_code(self, code_generator):
-        return self.value.generate_code(code_generator)
-
 class VariableNode(ASTNode):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
     def generate_code(self, code_generator):
-        code_generator.add_variable(self.name)
         return self.name
 
 class NumberNode(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value  # Representação em string do número
 
     def generate_code(self, code_generator):
         return self.value
 
+# Nós compartilhados: só existem 26 variáveis e 10 dígitos, então cada um é criado uma vez
+_VAR_NODES = {c: VariableNode(c) for c in 'abcdefghijklmnopqrstuvwxyz'}
+_NUM_NODES = {d: NumberNode(d) for d in '0123456789'}
+
+# Bit de cada variável no mapa de variáveis usadas do Parser
+_VAR_BITS = {c: 1 << i for i, c in enumerate('abcdefghijklmnopqrstuvwxyz')}
+
 class Parser:
     def __init__(self, lexer):
-        self.lexer = lexer
-        self.token = self.lexer.get_next_token()
+        self.tokens = tuple(lexer)  # Entrada inteira tokenizada de uma vez
+        self.i = 0
+        self._var_bits = 0  # Mapa de bits das variáveis usadas, 'a' no bit 0
+        self.token = self.tokens[0]
+        # Tabela de despacho: tipo do token inicial -> analisador do comando
+        self._dispatch = {
+            '=': self.assign_command,
+            'G': self.get_command,
+            '+': self._binop_cmd('+'),
+            '-': self._binop_cmd('-'),
+            '*': self._binop_cmd('*'),
+            '/': self._binop_cmd('/'),
+            '%': self._binop_cmd('%'),
+            'P': self.print_command,
+            'I': self.if_command,
+            'W': self.while_command,
+            '{': self.composite_command,
+        }
 
     def eat(self, token_type):
         if self.token.type == token_type:
-            self.token = self.lexer.get_next_token()
+            self._advance()
         else:
-            raise Exception(f'Token inesperado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}. Esperado "{token_type}".')
+            raise self._unexpected(token_type)
+
+    def _advance(self):
+        """Avança para o próximo token."""
+        self.i += 1
+        self.token = self.tokens[self.i]
+
+    def _unexpected(self, token_type):
+        """Monta o erro de token inesperado (só chamado quando há divergência)."""
+        return Exception(f'Token inesperado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}. Esperado "{token_type}".')
 
     def program(self):
         # Program ::= Command { Command }
@@ -210,104 +273,38 @@ class Parser:
 
     def command(self):
         # Determina qual comando analisar com base no token atual
-        if self.token.type == '=':
-            return self.assign_command()
-        elif self.token.type == 'G':
-            return self.get_command()
-        elif self.token.type == '+':
-            return self.add_command()
-        elif self.token.type == '-':
-            return self.sub_command()
-        elif self.token.type == '*':
-            return self.mult_command()
-        elif self.token.type == '/':
-            return self.div_command()
-        elif self.token.type == '%':
-            return self.mod_command()
-        elif self.token.type == 'P':
-            return self.print_command()
-        elif self.token.type == 'I':
-            return self.if_command()
-        elif self.token.type == 'W':
-            return self.while_command()
-        elif self.token.type == '{':
-            return self.composite_command()
-        else:
-            raise Exception(f'Comando inexistente "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
+        try:
+            handler = self._dispatch[self.token.type]
+        except KeyError:
+            raise Exception(f'Comando inexistente "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.') from None
+        return handler()
 
     def assign_command(self):
         # AssignCommand ::= “=” Variable Value
         self.eat('=')
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada após "=", mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        var = self.variable()
-        self.eat('VARIABLE')
+        var = self._eat_variable('após "="')
         val = self.value()
-        return AssignCommandNode(var.name, val)
+        return AssignCommandNode(var, val)
 
     def get_command(self):
         # GetCommand ::= “G” Variable
         self.eat('G')
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada após "G", mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        var = self.variable()
-        self.eat('VARIABLE')
-        return GetCommandNode(var.name)
-
-    def add_command(self):
-        # AddCommand ::= “+” Variable Value Value
-        self.eat('+')
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada após "+", mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        var = self.variable()
-        self.eat('VARIABLE')
-        val1 = self.value()
-        val2 = self.value()
-        return BinaryOperationNode('+', var.name, val1, val2)
-
-    def sub_command(self):
-        # SubCommand ::= “-” Variable Value Value
-        self.eat('-')
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada após "-", mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        var = self.variable()
-        self.eat('VARIABLE')
-        val1 = self.value()
-        val2 = self.value()
-        return BinaryOperationNode('-', var.name, val1, val2)
-
-    def mult_command(self):
+        var = self._eat_variable('após "G"')
+        return GetCommandNode(var)
+
+    def _binop_cmd(self, op):
+        # AddCommand  ::= “+” Variable Value Value
+        # SubCommand  ::= “-” Variable Value Value
         # MultCommand ::= “*” Variable Value Value
-        self.eat('*')
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada após "*", mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        var = self.variable()
-        self.eat('VARIABLE')
-        val1 = self.value()
-        val2 = self.value()
-        return BinaryOperationNode('*', var.name, val1, val2)
-
-    def div_command(self):
-        # DivCommand ::= “/” Variable Value Value
-        self.eat('/')
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada após "/", mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        var = self.variable()
-        self.eat('VARIABLE')
-        val1 = self.value()
-        val2 = self.value()
-        return BinaryOperationNode('/', var.name, val1, val2)
-
-    def mod_command(self):
-        # ModCommand ::= “%” Variable Value Value
-        self.eat('%')
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada após "%", mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        var = self.variable()
-        self.eat('VARIABLE')
-        val1 = self.value()
-        val2 = self.value()
-        return BinaryOperationNode('%', var.name, val1, val2)
+        # DivCommand  ::= “/” Variable Value Value
+        # ModCommand  ::= “%” Variable Value Value
+        def binop_command():
+            self.eat(op)
+            var = self._eat_variable(f'após "{op}"')
+            val1 = self.value()
+            val2 = self.value()
+            return BinaryOperationNode(op, var, val1, val2)
+        return binop_command
 
     def print_command(self):
         # PrintCommand ::= “P” Value
@@ -340,10 +337,7 @@ class Parser:
 
     def comparison(self):
         # Comparison ::= Variable Operator Value
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada na comparação, mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        left = self.variable()
-        self.eat('VARIABLE')
+        left = _VAR_NODES[self._eat_variable('na comparação')]
         op = self.operator()
         right = self.value()
         return ComparisonNode(left, op, right)
@@ -364,36 +358,63 @@ class Parser:
     def value(self):
         # Value ::= Variable | Number
         if self.token.type == 'VARIABLE':
-            var = self.variable()
-            self.eat('VARIABLE')
-            return ValueNode(var)
+            return _VAR_NODES[self._eat_variable()]
         elif self.token.type == 'NUMBER':
-            num = NumberNode(self.token.value)
+            num = _NUM_NODES[self.token.value]
             self.eat('NUMBER')
-            return ValueNode(num)
+            return num
         else:
             raise Exception(f'Valor inválido "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}. Esperado variável ou número.')
 
-    def variable(self):
-        if self.token.type != 'VARIABLE':
-            raise Exception(f'Variável esperada, mas encontrado "{self.token.type}" na linha {self.token.line}, coluna {self.token.column}.')
-        var_name = self.token.value
-        return VariableNode(var_name)
+    def _eat_variable(self, where=None):
+        # Consome uma variável e devolve o seu nome
+        token = self.token
+        if token.type != 'VARIABLE':
+            expected = f'Variável esperada {where}' if where else 'Variável esperada'
+            raise Exception(f'{expected}, mas encontrado "{token.type}" na linha {token.line}, coluna {token.column}.')
+        self._advance()
+        self._var_bits |= _VAR_BITS[token.value]
+        return token.value
+
+    @property
+    def variables(self):
+        """Variáveis usadas, em ordem alfabética."""
+        bits = self._var_bits
+        return [c for c, bit in _VAR_BITS.items() if bits & bit]
 
 class CodeGenerator:
-    def __init__(self):
-        self.code = []
-        self.variables = set()
+    def __init__(self, out=None):
+        self.code = io.StringIO() if out is None else out  # Destino das linhas emitidas
         self.indent_level = 1
+        self._indents = ['    ' * level for level in range(8)]  # Cresce sob demanda
 
     def indent(self):
-        return '    ' * self.indent_level
+        try:
+            return self._indents[self.indent_level]
+        except IndexError:
+            while len(self._indents) <= self.indent_level:
+                self._indents.append('    ' * len(self._indents))
+            return self._indents[self.indent_level]
 
     def emit(self, line):
-        self.code.append(line)
-
-    def add_variable(self, var):
-        self.variables.add(var)
+        self.code.write(line)
+        self.code.write('\n')
+
+    def generate(self, root):
+        """Percorre a árvore de comandos com uma pilha explícita, sem recursão."""
+        stack = [(root, False)]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node, leaving = pop()
+            if leaving:
+                node.emit_close(self)
+                continue
+            node.emit_open(self)
+            if node.is_block:
+                push((node, True))
+                for child in reversed(node.children()):
+                    push((child, False))
 
 def main():
     import sys
@@ -415,21 +436,18 @@ def main():
 
     # Cria um lexer e parser
     lexer = Lexer(input_code)
-    parser = Parser(lexer)
 
     # Analisa a entrada e constrói a AST
     try:
+        parser = Parser(lexer)
         ast_root = parser.program()
     except Exception as e:
         print(f'Erro de análise: {e}')
         return
 
-    # Gera o código a partir da AST
-    code_generator = CodeGenerator()
-    ast_root.generate_code(code_generator)
-
-    # Prepara o código C final
-    variables = ', '.join(sorted(code_generator.variables))
+    # Prepara o código C final. As variáveis vêm da análise, então a declaração
+    # sai antes de gerar o corpo
+    variables = ', '.join(parser.variables)
     c_code = [
         '#include <stdio.h>',
         'int main() {',
@@ -441,20 +459,34 @@ def main():
         c_code.append('    int dummy;')  # Caso não haja variáveis
 
     c_code.append('    char str[512]; // auxiliar na leitura com G')
+    c_code.append('')  # Quebra de linha antes do corpo
 
-    c_code.extend(code_generator.code)
-
-    c_code.append('    gets(str);')  # Conforme o exemplo, adiciona no final
-    c_code.append('    return 0;')
-    c_code.append('}')
+    c_end = [
+        '    gets(str);',  # Conforme o exemplo, adiciona no final
+        '    return 0;',
+        '}',
+    ]
 
-    # Escreve o código C gerado no arquivo de saída
+    # Gera o código a partir da AST num arquivo temporário ao lado da saída, que
+    # só substitui a saída anterior quando tudo deu certo
+    tmp_filename = output_filename + '.tmp'
     try:
-        with open(output_filename, 'w', encoding='utf-8') as f:
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
             f.write('\n'.join(c_code))
-    except Exception as e:
+            code_generator = CodeGenerator(f)
+            code_generator.generate(ast_root)
+            f.write('\n'.join(c_end))
+        os.replace(tmp_filename, output_filename)
+    except OSError as e:
         print(f'Erro ao escrever o arquivo de saída: {e}')
         return
+    except Exception as e:
+        print(f'Erro na geração de código: {e}')
+        return
+    finally:
+        # Não deixa o temporário para trás se algo falhou
+        with contextlib.suppress(OSError):
+            os.remove(tmp_filename)
 
 if __name__ == '__main__':
     main()